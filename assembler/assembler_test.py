@@ -0,0 +1,35 @@
+import os, tempfile, unittest
+import numpy as np
+
+from assembler.assembler import assemble
+from computer_core.constants import Int
+
+# NOP then HALT, with no arguments
+NOP_HALT = np.array([0, 0b000_001 << 26], dtype=Int)
+
+
+class TestAssembler(unittest.TestCase):
+    def test_line_endings(self):
+        """Test that a program given as a string is split into lines on any line ending"""
+        for line_ending in ("\n", "\r\n", "\r"):
+            with self.subTest(line_ending=repr(line_ending)):
+                program = assemble(f"NOP # comment{line_ending}{line_ending}HALT{line_ending}")
+                np.testing.assert_array_equal(program, NOP_HALT)
+
+    def test_file_input(self):
+        """Test that a program can be read from an open file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "program.asm")
+            with open(path, "w", newline="") as file:
+                file.write("[START]\r\nNOP\r\nHALT\r\n")
+            with open(path) as file:
+                np.testing.assert_array_equal(assemble(file), NOP_HALT)
+
+    def test_label_errors(self):
+        """Test that undefined labels are reported as such, and malformed ones as parse errors"""
+        with self.assertRaisesRegex(SyntaxError, "unknown label 'nope'"):
+            assemble("JUMP 0 [nope]")
+        for line in ("JUMP 0 0 [loop", "JUMP 0 0 [lo]op]"):
+            with self.subTest(line=line):
+                with self.assertRaisesRegex(SyntaxError, "Could not parse line 0"):
+                    assemble(line)
@@ -1,30 +1,50 @@
-from computer_core.constants import Int
+import re
 
-def make_ins_data(opcode, arg1, arg2, data):
+# Matches binary literals of the form B0101
+_BINARY_ARG = re.compile(r'B([01]+)\Z').match
+
+def data_encoder(opcode):
     """
-    Creates an instruction that takes two 5 bit arguments and a 16-bit address/data argument.
+    Creates a function which builds the fields of an instruction with the given opcode that takes two 5 bit arguments
+    and a 16-bit address/data argument. The opcode is converted to a plain python int once, here.
+    Fields are plain python ints; they are cast to Int once for the whole program when packed.
     """
-    return (Int(opcode) << 26) | (Int(arg1) << 21) | (Int(arg2) << 16) | Int(data)
+    opcode = int(opcode)
+
+    def encode(arg1, arg2, data):
+        return opcode, arg1, arg2, data & 0xFFFF
+    return encode
 
 
-def make_ins_reg(opcode, arg1, arg2, arg3):
+def reg_encoder(opcode):
     """
-    Creates an instruction that takes three 5 bit arguments.
+    Creates a function which builds the fields of an instruction with the given opcode that takes three 5 bit arguments.
+    The third argument is stored in the top 5 bits of the data field.
     """
-    return (Int(opcode) << 26) | (Int(arg1) << 21) | (Int(arg2) << 16) | (Int(arg3) << 11)
+    opcode = int(opcode)
+
+    def encode(arg1, arg2, arg3):
+        return opcode, arg1, arg2, arg3 << 11
+    return encode
+
+
+def pack_instructions(fields):
+    """
+    Packs an (n, 4) array of (opcode, arg1, arg2, data) instruction fields into n machine code instructions.
+    This is done for the whole program at once rather than once per instruction.
+    """
+    return (fields[:, 0] << 26) | (fields[:, 1] << 21) | (fields[:, 2] << 16) | fields[:, 3]
 
 
 def parse_arg(s, range_max, range_min=0):
     """
     Parses an argument that could be in decimal or binary syntax
     """
+    binary_match = _BINARY_ARG(s)
     try:
-        if len(s) >= 2 and s[0] == "B":
-            val = int(s[1:], 2)
-        else:
-            val = int(s, 10)
-    except Exception as e:
-        raise Exception(f"Failed to parse argument '{s}'.") from e
+        val = int(binary_match.group(1), 2) if binary_match else int(s, 10)
+    except ValueError as e:
+        raise ValueError(f"Failed to parse argument '{s}'.") from e
     if not range_min <= val < range_max:
         raise ValueError(f"Argument {val} is out of range (min {range_min}, max {range_max}).")
     return val
@@ -36,6 +56,18 @@ def parse_arg_multiple(max_range, *args):
     """
     return (parse_arg(s, max_range) for s in args)
 
+def parse_flags(flag_args, flag_table):
+    """
+    Combines the bits of the given flag tokens, as specified by the flag table (e.g. COPY_FLAGS or JUMP_FLAGS).
+    """
+    flags = 0
+    for flag_arg in flag_args:
+        if (flag := flag_table.get(flag_arg)) is None:
+            raise SyntaxError(f"Unknown flag {flag_arg}.")
+        flags |= flag
+    return flags
+
+
 def require_args(args, min_n_args, max_n_args):
     n = len(args)
     if min_n_args is not None and n < min_n_args:
@@ -9,6 +9,13 @@ from computer_core import computer
 from computer_core.constants import *
 
 
+def tree_bits(c, cache_section=0):
+    """
+    Returns the packed tree bits of a cache section as a string in heap index order, as drawn in the diagrams below.
+    """
+    return f"{c.memory._cache_tree_bits[cache_section]:0{CACHE_SECTION_SIZE - 1}b}"[::-1]
+
+
 class TestCache(unittest.TestCase):
     def test_cache(self):
         c = computer.Computer()
@@ -16,7 +23,7 @@ class TestCache(unittest.TestCase):
         Test behaviour of cache.
         Starting with empty cache:
               ┌------0              ╮
-           ┌--0          ┌--0       ├ tree bits (stored in a bit array by the heap convention)
+           ┌--0          ┌--0       ├ tree bits (packed into one int per section by the heap convention)
          ┌-0    ┌-0    ┌-0    ┌-0   ╯
         [ ][ ] [ ][ ] [ ][ ] [ ][ ] - address of stored memory
          0  1   2  3   4  5   6  7  - (cache_index)
@@ -31,7 +38,7 @@ class TestCache(unittest.TestCase):
         [1][ ] [ ][ ] [ ][ ] [ ][ ] - address of stored memory
          0  1   2  3   4  5   6  7  - cache_index
         """
-        self.assertEqual('1101000', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('1101000', tree_bits(c))
         self.assertEqual(1, c.memory._cache_addresses[0,0])
         self.assertEqual(10, c.memory._cache[0,0])
 
@@ -45,7 +52,7 @@ class TestCache(unittest.TestCase):
         [1][ ] [ ][ ] [2][ ] [ ][ ] - address of stored memory
          0  1   2  3   4  5   6  7  - cache_index
         """
-        self.assertEqual('0111010', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('0111010', tree_bits(c))
         self.assertEqual(2, c.memory._cache_addresses[0,4])
         self.assertEqual(20, c.memory._cache[0,4])
 
@@ -59,22 +66,22 @@ class TestCache(unittest.TestCase):
         [1][ ] [ ][ ] [2][ ] [ ][ ] - address of stored memory
          0  1   2  3   4  5   6  7  - cache_index
         """
-        self.assertEqual('1111010', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('1111010', tree_bits(c))
         self.assertEqual(1, c.memory._cache_addresses[0,0])
         self.assertEqual(100, c.memory._cache[0,0])
 
         c.memory[3] = Int(30)
-        self.assertEqual('0101011', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('0101011', tree_bits(c))
         c.memory[4] = Int(40)
-        self.assertEqual('1001111', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('1001111', tree_bits(c))
         c.memory[5] = Int(50)
-        self.assertEqual('0011101', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('0011101', tree_bits(c))
         c.memory[6] = Int(60)
-        self.assertEqual('1110101', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('1110101', tree_bits(c))
         c.memory[7] = Int(70)
-        self.assertEqual('0100100', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('0100100', tree_bits(c))
         c.memory[8] = Int(80)
-        self.assertEqual('1000000', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('1000000', tree_bits(c))
         """
         Some more additions:
               ┌------0              ╮
@@ -125,7 +132,7 @@ class TestCache(unittest.TestCase):
          We must also check if the value of 20 at address 2 has been correctly transferred to the main memory,
          and that it can be retrieved and re-stored in the cache.
         """
-        self.assertEqual('0010010', c.memory._cache_tree_bits[0].to01())
+        self.assertEqual('0010010', tree_bits(c))
         self.assertEqual(9, c.memory._cache_addresses[0,4])
         self.assertEqual(90, c.memory._cache[0,4])
 
@@ -136,3 +143,22 @@ class TestCache(unittest.TestCase):
         self.assertEqual(20, c.memory[2])
         self.assertEqual(2, c.memory._cache_addresses[0,0])
         self.assertEqual(20, c.memory._cache[0,0])
+
+        # The index used to find hits agrees with the cache contents
+        self.assertEqual({2: 0, 6: 1, 4: 2, 8: 3, 9: 4, 5: 5, 3: 6, 7: 7}, c.memory._cache_positions[0])
+
+    def test_flush(self):
+        """
+        Test that flushing writes the values held only in the cache back to main memory, without evicting them.
+        """
+        c = computer.Computer()
+        c.memory[1] = Int(10)
+        c.memory[2049] = Int(20)  # in the second cache section
+        self.assertEqual(0, c.memory[3])  # cached by a read, so clean
+        self.assertEqual(0, c.memory._array[1])
+
+        c.memory.flush()
+        self.assertEqual(10, c.memory._array[1])
+        self.assertEqual(20, c.memory._array[2049])
+        self.assertFalse(any(c.memory._cache_dirty))
+        self.assertEqual({1: 0, 3: 4}, c.memory._cache_positions[0])
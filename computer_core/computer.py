@@ -2,35 +2,90 @@
 This file contains the implementation of the computer as per the specification in the README.
 """
 
-import numpy as np
+from functools import lru_cache
+
 from typing import Dict, Callable
 from computer_core.constants import *
 from computer_core.memories import Memory, DataRegisterArray
-from bitarray import bitarray
 from computer_core.instructions import instructions
 
+# Debug output is written out whenever this many lines have been collected, so that long runs show their progress
+DEBUG_LOG_FLUSH_LINES = 1000
+
+
+def invalid_opcode_function(opcode):
+    """
+    Make the function held in the opcode table for an opcode which no instruction uses, so that decoding errors are
+    raised through the same call as every other instruction rather than by a check in the execute loop.
+    """
+    def execute_on(computer, arg1, arg2, data):
+        raise DecodingError(f"Invalid opcode: {bin(opcode)}.")
+    return execute_on
+
+
+def debug_opcode_function(instruction, execute_on):
+    """
+    Make the function held in the debug opcode table for an instruction, which logs the instruction before executing
+    it. Keeping this out of the instructions means they do not check for debug mode on every normal run.
+    """
+    def debug_execute_on(computer, arg1, arg2, data):
+        if (message := instruction.debug_message(arg1, arg2, data)) is not None:
+            computer.debug_log.append(message)
+        execute_on(computer, arg1, arg2, data)
+        if len(computer.debug_log) >= DEBUG_LOG_FLUSH_LINES:
+            computer.flush_debug_log()
+    return debug_execute_on
+
+
+def prefetching_load_function(execute_on):
+    """
+    Make the function held in the opcode table for LOAD when pointer prefetching is enabled. After loading a register,
+    this brings the address it now holds into the cache, in case it is a pointer which is about to be followed.
+    """
+    def prefetching_execute_on(computer, arg1, arg2, data):
+        execute_on(computer, arg1, arg2, data)
+        computer.memory.prefetch(computer.data_regs[arg1])
+    return prefetching_execute_on
+
 
 class Computer:
-    def __init__(self, memory_size=MEMORY_SIZE_MAX):
+    def __init__(self, memory_size=MEMORY_SIZE_MAX, pointer_prefetch=False):
         # Data registers
-        self.data_regs = DataRegisterArray()
-        # COMP register, for the result of logical operations such as CMP
-        self.comp_reg = bitarray('0'*32, endian='little')
+        self.data_regs = DataRegisterArray(flush_debug_log=self.flush_debug_log)
+        # COMP register, for the result of logical operations such as CMP. Bit i is held in bit i of the integer.
+        self.comp_reg = 0
         # Status register, for other status bits, such as `running' and overflow flags
-        self.status_reg = bitarray('0'*32, endian='little')
-        # Program counter
-        self.PC = np.uint16(0)
+        self.status_reg = 0
+        # Program counter. A plain int, which is wrapped to 16 bits explicitly, to avoid numpy scalar arithmetic
+        self.PC = 0
         # (Unified) Memory
         self.memory = Memory(memory_size)
         self.memory_size = memory_size
-        # Functions to be called by the instructions
+        # Functions to be called by the instructions, indexed by opcode, so one entry per value of the opcode field.
+        # Every dispatch is a single index, so there is no benefit in ordering instructions by how common they are
+        opcode_mask, opcode_shift = OPCODE_MASK
+        self.opcode_functions = [invalid_opcode_function(opcode) for opcode in range((opcode_mask >> opcode_shift) + 1)]
+        # The same, but logging each instruction as it is executed, for use in debug mode
+        self.debug_opcode_functions = self.opcode_functions.copy()
+        for instruction in instructions:
+            self.opcode_functions[int(instruction.opcode())] = instruction.execute_on
+            self.debug_opcode_functions[int(instruction.opcode())] = \
+                debug_opcode_function(instruction, instruction.execute_on)
+        # Pointer prefetching is a variant of LOAD, so when it is off, loads pay nothing for it
+        if pointer_prefetch:
+            for opcode_functions in (self.opcode_functions, self.debug_opcode_functions):
+                opcode_functions[int(OPCODE_LOAD)] = prefetching_load_function(opcode_functions[int(OPCODE_LOAD)])
         self.debug_mode = False
+        # The CostMetricTracker in use, if any, which is told about every instruction executed
+        self.cost_tracker = None
+        # Debug output is collected and written out in one go, as printing every line is slow
+        self.debug_log = []
 
     def set_memory_chunk(self, address, data):
         """
         Set a chunk of memory, useful for loading programs
         """
-        self.memory[address: address + data.size] = data
+        self.memory.copy_from(address, data)
 
     def set_memory_address(self, address, value):
         """
@@ -44,13 +99,27 @@ class Computer:
         """
         return self.memory[address]
 
+    def flush_debug_log(self):
+        """
+        Write out any collected debug output
+        """
+        if self.debug_log:
+            print('\n'.join(self.debug_log))
+            self.debug_log.clear()
+
     @staticmethod
+    @lru_cache(maxsize=MEMORY_SIZE_MAX)
     def decode(instruction):
         """
-        Split an instruction into opcode and arguments
+        Split an instruction into opcode and arguments.
+        Decoded instructions are cached by their machine code, which acts as a translation cache for loops. Keying on
+        the instruction itself rather than its address means self-modifying programs never see a stale decoding.
+        A hit in lru_cache is handled in C, and was measured to be faster than filling a dict when programs are loaded.
         """
-        return OPCODE_MASK.get(instruction), ARG1_MASK.get(instruction), \
-            ARG2_MASK.get(instruction), DATA_MASK.get(instruction)
+        # Equivalent to OPCODE_MASK.get(instruction) etc., but on a plain int to avoid numpy scalar arithmetic
+        instruction = int(instruction)
+        return (instruction >> 26) & 0b111111, (instruction >> 21) & 0b11111, \
+            (instruction >> 16) & 0b11111, instruction & 0xFFFF
 
     def execute(self, debug_mode=False):
         """
@@ -58,20 +127,33 @@ class Computer:
         """
         self.debug_mode = debug_mode
         # Set 'running' flag
-        self.status_reg[RUNNING_FLAG_INDEX] = True
-
-        while self.status_reg[RUNNING_FLAG_INDEX]:
-            # Fetch
-            machine_code_instruction = self.memory[self.PC]
-
-            # Decode and execute
-            opcode, arg1, arg2, data = Computer.decode(machine_code_instruction)
-            for instruction in instructions:
-                if opcode == instruction.opcode():
-                    instruction.execute_on(self, arg1, arg2, data)
-                    break
-            else:
-                raise DecodingError(f"Invalid opcode: {bin(opcode)}.")
-
-            # Increase PC
-            self.PC += 1  # Note that this will happen regardless of jump
\ No newline at end of file
+        self.status_reg |= RUNNING_FLAG
+
+        # Bind the attributes used every cycle to locals. The PC and registers stay on the computer, as the
+        # instructions read and modify them.
+        read_memory = self.memory.read
+        opcode_functions = self.debug_opcode_functions if debug_mode else self.opcode_functions
+        decode = Computer.decode
+        cost_tracker = self.cost_tracker
+
+        try:
+            while self.status_reg & RUNNING_FLAG:
+                # Count the instruction before fetching it, so that a sampling tracker sees the same count for the
+                # fetch as for the memory accesses the instruction makes
+                if cost_tracker is not None:
+                    cost_tracker.log_execute_instruction()
+
+                # Fetch
+                machine_code_instruction = read_memory(self.PC)
+
+                # Decode and execute. Instructions are dispatched to their classes rather than inlined into this loop,
+                # so that the instruction set can be extended by adding classes to instructions.py
+                opcode, arg1, arg2, data = decode(machine_code_instruction)
+                opcode_functions[opcode](self, arg1, arg2, data)
+
+                # Increase PC
+                self.PC = (self.PC + 1) & 0xFFFF  # Note that this will happen regardless of jump
+        finally:
+            # Leave main memory up to date with everything the program wrote, in one bulk write back
+            self.memory.flush()
+            self.flush_debug_log()
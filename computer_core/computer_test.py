@@ -1,9 +1,10 @@
-import io, sys, unittest, bitarray
+import io, sys, unittest
 from unittest.mock import patch
 import numpy as np
 Int = np.uint32
 from computer_core import constants, computer
 from computer_core import instructions
+from computer_core.memories import NoSuchRegisterError
 
 class TestComputer(unittest.TestCase):
 
@@ -45,6 +46,109 @@ class TestComputer(unittest.TestCase):
         Comp.assert_called_with(c,19, 20, 21 << 11)
         Halt.assert_called_with(c,22, 23, 24)
 
+    def test_execute_invalid_opcode(self):
+        """Test that an opcode which no instruction uses raises a decoding error."""
+        program = np.array([
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b110_110_00000_00000_0000000000000000,  # No such instruction
+        ], dtype=Int)
+
+        c = computer.Computer(memory_size=8)
+        c.set_memory_chunk(0, program)
+        with self.assertRaises(computer.DecodingError):
+            c.execute()
+        self.assertEqual(c.PC, 1)
+
+    def test_execute_debug_mode(self):
+        """Test that each instruction is logged in debug mode, and nothing is logged otherwise."""
+        program = np.array([
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b000_001_00000_00000_0000000000000000,  # HALT
+        ], dtype=Int)
+
+        c = computer.Computer(memory_size=8)
+        c.set_memory_chunk(0, program)
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            c.execute(debug_mode=True)
+        self.assertEqual(stdout.getvalue(), "NOP\nHALT\n")
+
+        c = computer.Computer(memory_size=8)
+        c.set_memory_chunk(0, program)
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            c.execute()
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_execute_debug_mode_flushes_during_run(self):
+        """Test that debug output is written out in chunks while a program runs, not only once it has finished."""
+        program = np.array([
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b000_001_00000_00000_0000000000000000,  # HALT
+        ], dtype=Int)
+        output_at_halt = []
+
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            def halt(c, arg1, arg2, data):
+                output_at_halt.append(stdout.getvalue())
+                c.status_reg &= ~constants.RUNNING_FLAG
+
+            with patch.object(computer, "DEBUG_LOG_FLUSH_LINES", 2), \
+                    patch.object(instructions.Halt, "execute_on", side_effect=halt):
+                c = computer.Computer(memory_size=8)
+                c.set_memory_chunk(0, program)
+                c.execute(debug_mode=True)
+
+        self.assertEqual(output_at_halt, ["NOP\nNOP\n"])
+        self.assertEqual(stdout.getvalue(), "NOP\nNOP\nNOP\nHALT\n")
+
+    def test_execute_debug_mode_warning_order(self):
+        """Test that a warning about writing a read-only register comes after the debug output which preceded it."""
+        program = np.array([
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b001_001_00010_00011_0000000000000000,  # ADD 2 3 0
+            0b000_000_00000_00000_0000000000000000,  # NOP
+            0b000_001_00000_00000_0000000000000000,  # HALT
+        ], dtype=Int)
+
+        c = computer.Computer(memory_size=8)
+        c.set_memory_chunk(0, program)
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            c.execute(debug_mode=True)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0], "NOP")
+        self.assertTrue(lines[1].startswith("add"))
+        self.assertEqual(lines[2], "Warning: attempted to write to data register 0, but it is read-only.")
+        self.assertEqual(lines[3:], ["NOP", "HALT"])
+
+    def test_execute_flushes_memory(self):
+        """Test that values written by a program reach main memory by the end of execution, not only the cache."""
+        program = np.array([
+            0b011_010_00000_00001_0000000000000101,  # STORE 0 5 IMMEDIATE
+            0b000_001_00000_00000_0000000000000000,  # HALT
+        ], dtype=Int)
+
+        c = computer.Computer(memory_size=8)
+        c.set_memory_chunk(0, program)
+        c.execute()
+        self.assertEqual(c.memory._array[5], program[0])
+        self.assertFalse(any(c.memory._cache_dirty))
+
+    def test_pointer_prefetch(self):
+        """Test that with pointer prefetching, LOAD brings the address it loaded into the cache, and only then"""
+        for pointer_prefetch in (False, True):
+            c = computer.Computer(memory_size=10, pointer_prefetch=pointer_prefetch)
+            c.set_memory_address(5, Int(8))
+            c.opcode_functions[int(constants.OPCODE_LOAD)](c, 2, 0, 5)
+            self.assertEqual(c.data_regs[2], 8)
+            self.assertEqual(8 in c.memory._cache_positions[0], pointer_prefetch)
+
+        # A loaded value which is not a valid address is not prefetched
+        c = computer.Computer(memory_size=10, pointer_prefetch=True)
+        c.set_memory_address(5, Int(80))
+        c.opcode_functions[int(constants.OPCODE_LOAD)](c, 2, 0, 5)
+        self.assertEqual(c.data_regs[2], 80)
+
     def test_mem_set(self):
         """Test setting an address memory (e.g.) loading a constant"""
         data = Int(0b10011001100110011001100110011001)
@@ -103,6 +207,34 @@ class TestComputer(unittest.TestCase):
 
         np.testing.assert_array_equal(c.memory[3:9], data)
 
+    def test_mem_slices(self):
+        """Test reading and writing slices of memory, which bypass the cache but must agree with it"""
+        c = computer.Computer(memory_size=10)
+        c.memory[4] = Int(40)  # Only held in the cache until it is evicted
+        np.testing.assert_array_equal(c.memory[3:6], np.array([0, 40, 0], dtype=Int))
+
+        c.memory[2:5] = Int(7)
+        self.assertEqual(c.memory[4], Int(7))
+        np.testing.assert_array_equal(c.memory[:], np.array([0, 0, 7, 7, 7, 0, 0, 0, 0, 0], dtype=Int))
+
+        with self.assertRaises(computer.SegmentationFaultError):
+            c.memory[8:11]
+
+    def test_data_reg_slices(self):
+        """Test writing slices of the data registers, which must leave the read-only registers alone"""
+        c = computer.Computer()
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            c.data_regs[0:4] = np.array([5, 6, 7, 8], dtype=Int)
+        self.assertEqual(stdout.getvalue().count("read-only"), 2)
+        self.assertEqual([c.data_regs[reg] for reg in range(5)], [0, 1, 7, 8, 0])
+
+        c.data_regs[3:] = Int(9)
+        self.assertEqual([c.data_regs[reg] for reg in range(2, constants.N_DATA_REGISTERS)],
+                         [7] + [9] * (constants.N_DATA_REGISTERS - 3))
+
+        with self.assertRaises(NoSuchRegisterError):
+            c.data_regs[30:34] = np.zeros(4, dtype=Int)
+
     def test_mem_set_chunk_errors(self):
         """Test failure cases setting of a chunk of memory"""
         data = np.array([1, 2, 3, 1 << 32 - 1, 1 << 32 - 2, 1 << 32 - 3], dtype=Int)
@@ -1,13 +1,18 @@
+from typing import NamedTuple
+
 from numpy import uint32 as Int
 from numpy import ndarray as Array
 
 ZERO, ONE, ONES, HALF_ONES, SIG_HALF_ONES = Int(0), Int(1), ~Int(0), Int((1 << 16) - 1), Int(((1 << 16) - 1) << 16)
+# For truncating results of arithmetic on the data registers, which hold plain ints, to 32 bits
+WORD_MASK = (1 << 32) - 1
 
 
-class Mask:
-    def __init__(self, mask, shift):
-        self.mask = Int(mask)
-        self.shift = Int(shift)
+class Mask(NamedTuple):
+    # Plain ints, so that masking a plain int (such as an address) stays out of numpy scalar arithmetic.
+    # Being a tuple, a mask can also be unpacked into locals in one go: mask, shift = OPCODE_MASK
+    mask: int
+    shift: int
 
     def get(self, var):
         return (var & self.mask) >> self.shift
@@ -20,8 +25,9 @@ N_DATA_REGISTERS = 32
 MEMORY_SIZE_MAX = 1 << 16
 CACHE_SECTION_RESPONSIBILITY = MEMORY_SIZE_MAX // 32
 CACHE_SECTION_SIZE = 8
+CACHE_SECTION_SHIFT = (CACHE_SECTION_RESPONSIBILITY - 1).bit_length()
 
-CACHE_SECTION_INDEX_MASK = Mask(0b11111_00000000000, 11)
+CACHE_SECTION_INDEX_MASK = Mask(0b11111_00000000000, CACHE_SECTION_SHIFT)
 
 OPCODE_MASK = Mask(0b111111_00000_00000_0000000000000000, 26)
 ARG1_MASK = Mask(0b000000_11111_00000_0000000000000000, 21)
@@ -55,6 +61,9 @@ OPCODE_COMPLST = Int(0b010_011)
 RUNNING_FLAG_INDEX = 0
 OVERFLOW_FLAG_INDEX = 1
 
+RUNNING_FLAG = 1 << RUNNING_FLAG_INDEX
+OVERFLOW_FLAG = 1 << OVERFLOW_FLAG_INDEX
+
 HALF_COPY_FLAG_INDEX = 4
 SIGNIFICANT_SRC_FLAG_INDEX = 3
 SIGNIFICANT_DST_FLAG_INDEX = 2
@@ -64,6 +73,15 @@ IMMEDIATE_FLAG_INDEX = 0
 JUMP_CONDITION_INDEX = 4
 JUMP_SUBTRACT_INDEX = 3
 
+# Single-bit masks for testing the flags in ARG2 directly
+HALF_COPY_FLAG = 1 << HALF_COPY_FLAG_INDEX
+SIGNIFICANT_SRC_FLAG = 1 << SIGNIFICANT_SRC_FLAG_INDEX
+SIGNIFICANT_DST_FLAG = 1 << SIGNIFICANT_DST_FLAG_INDEX
+OVERWRITE_FLAG = 1 << OVERWRITE_FLAG_INDEX
+IMMEDIATE_FLAG = 1 << IMMEDIATE_FLAG_INDEX
+
+JUMP_SUBTRACT_FLAG = 1 << JUMP_SUBTRACT_INDEX
+
 INSTRUCTION_TIME_NS = 1
 CACHE_HIT_TIME_NS = 1
 CACHE_MISS_TIME_NS = 70
@@ -1,91 +1,103 @@
 """
-This file contains a class which functions as a context manager whose job is to hook onto the internal function calls of
-the computer in order to cost program execution in terms of memory usage and execution time.
+This file contains a class which functions as a context manager whose job is to cost program execution on a computer in
+terms of memory usage and execution time.
 
-It is quite a 'hacky' approach, but it keeps the main computer execution code cleaner by not having to pass around this
-object.
+While it is active, the computer, its memory and its data registers hold a reference to it, and report each instruction,
+cache lookup and register access to it. When no tracker is attached, this costs them a single check per event.
 """
 
-from computer_core.computer import Computer
+from math import log2
+
+import numpy as np
+
 from computer_core.constants import *
 
 class CostMetricTracker:
 
-    def __init__(self, computer, debug_mode = False):
+    def __init__(self, computer, debug_mode = False, sample_rate = 1):
         self.computer = computer
         self.instructions_executed = 0
-        self.accessed_memory_addresses = set()
-        self.accessed_datacache_addresses = set()
-        self.execution_time_ns = 0
+        # The number of accesses to each memory address, and one byte per data register set to 1 once it has been
+        # accessed. Indexing these is cheaper than adding to a set, and nothing is allocated while the program runs.
+        self.memory_access_counts = [0] * computer.memory_size
+        self.accessed_datacache_addresses = bytearray(computer.data_regs.size)
         self.cache_hits = 0
         self.cache_misses = 0
-        self.memory_accesses = 0
         self.debug_mode = debug_mode
 
-    def __enter__(self):
-        # Add a hook onto computer decoding (must happen once per instruction)
-        Computer.old_decode = Computer.decode
-        def new_decode(instruction):
-            self.log_execute_instruction()
-            return Computer.old_decode(instruction)
-        Computer.decode = new_decode
-
-        # Add a hook onto cache
-        type(self.computer.memory)._old_cache_lookup = type(self.computer.memory).cache_lookup
-        def new_cache_lookup(self_memory, address):
-            cache_section, cache_index, cache_hit = self.computer.memory._old_cache_lookup(address)
-            self.log_cache_lookup(address, cache_hit)
-            return cache_section, cache_index, cache_hit
-        type(self.computer.memory).cache_lookup = new_cache_lookup
-
-        # Add hooks onto the data register methods
-        type(self.computer.data_regs)._old_getitem = type(self.computer.data_regs).__getitem__
-        def new_getitem(self_memory, address):
-            self.log_datacache_access(address)
-            return self.computer.data_regs._old_getitem(address)
-        type(self.computer.data_regs).__getitem__ = new_getitem
-
-        type(self.computer.data_regs)._old_setitem = type(self.computer.data_regs).__setitem__
-        def new_setitem(self_memory, address, value):
-            self.log_datacache_access(address)
-            self.computer.data_regs._old_setitem(address, value)
-        type(self.computer.data_regs).__setitem__ = new_setitem
+        # For long programs, the memory accesses of only one in every sample_period instructions, including its fetch,
+        # can be logged, with the cache figures scaled up to match. The period is rounded to a power of two so that
+        # deciding whether to log is a single AND, and without sampling that check is skipped entirely.
+        if not 0 < sample_rate <= 1:
+            raise ValueError(f"Invalid sample rate {sample_rate}. Must be greater than 0 and at most 1")
+        self.sample_period = 1 << round(log2(1 / sample_rate))
+        self._sample_mask = self.sample_period - 1
+        if self.sample_period > 1:
+            self.log_cache_lookup = self._log_sampled_cache_lookup
 
+    def __enter__(self):
+        # Attach to the computer and the parts of it which report to the tracker
+        self._attach(self)
         return self
 
-
     def __exit__(self, exc_type, exc_val, exc_tb):
-        # Unhook the methods
-        type(self.computer.memory).cache_lookup = type(self.computer.memory)._old_cache_lookup
-        type(self.computer.data_regs).__setitem__ = type(self.computer.data_regs)._old_setitem
-        type(self.computer.data_regs).__getitem__ = type(self.computer.data_regs)._old_getitem
-        Computer.decode = Computer.old_decode
+        self._attach(None)
+        self.computer.flush_debug_log()
+
+    def _attach(self, cost_tracker):
+        self.computer.cost_tracker = cost_tracker
+        self.computer.memory.cost_tracker = cost_tracker
+        self.computer.data_regs.cost_tracker = cost_tracker
+
+    # Only the counts are kept as events are logged; the totals derived from them are worked out when asked for.
+
+    @property
+    def memory_accesses(self):
+        return (self.cache_hits + self.cache_misses) * self.sample_period
+
+    @property
+    def execution_time_ns(self):
+        return (self.instructions_executed * INSTRUCTION_TIME_NS
+                + (self.cache_hits * CACHE_HIT_TIME_NS + self.cache_misses * CACHE_MISS_TIME_NS) * self.sample_period)
 
     def log_execute_instruction(self):
         self.instructions_executed += 1
-        self.execution_time_ns += INSTRUCTION_TIME_NS
 
     def log_cache_lookup(self, address, cache_hit):
-        if self.debug_mode: print(f"Cache access at {address}: cache hit={cache_hit}.")
-        self.accessed_memory_addresses.add(address)
-        self.memory_accesses += 1
+        if self.debug_mode: self.computer.debug_log.append(f"Cache access at {address}: cache hit={cache_hit}.")
+        self.memory_access_counts[address] += 1
         if cache_hit:
             self.cache_hits += 1
-            self.execution_time_ns += CACHE_HIT_TIME_NS
         else:
             self.cache_misses += 1
-            self.execution_time_ns += CACHE_MISS_TIME_NS
+
+    def _log_sampled_cache_lookup(self, address, cache_hit):
+        if not self.instructions_executed & self._sample_mask:
+            CostMetricTracker.log_cache_lookup(self, address, cache_hit)
 
     def log_datacache_access(self, address):
-        self.accessed_datacache_addresses.add(address)
+        self.accessed_datacache_addresses[address] = 1
+
+    def hot_addresses(self, n=10):
+        """
+        Return up to n of the most accessed memory addresses as (address, number of accesses) pairs, most accessed
+        first. Addresses with the same number of accesses are given in order. When sampling, only the sampled accesses
+        are counted.
+        """
+        counts = np.array(self.memory_access_counts)
+        hottest = np.argsort(-counts, kind='stable')[:n]
+        return [(int(address), int(counts[address])) for address in hottest if counts[address]]
 
     def summary(self):
-        cache_mem = len(self.accessed_datacache_addresses) * 4
-        ram_mem = len(self.accessed_memory_addresses) * 4
-        return \
+        cache_mem = self.accessed_datacache_addresses.count(1) * 4
+        ram_mem = (len(self.memory_access_counts) - self.memory_access_counts.count(0)) * 4
+        cache_hits, cache_misses = self.cache_hits * self.sample_period, self.cache_misses * self.sample_period
+        sampling = "" if self.sample_period == 1 else \
+            f"Cache figures estimated from 1 in {self.sample_period} instructions; RAM memory used is a lower bound.\n"
+        return sampling + \
 f"""Instructions executed: {self.instructions_executed}.
-Cache hits: {self.cache_hits} ({100*self.cache_hits/self.memory_accesses:.1f}%)
-Cache misses: {self.cache_misses} ({100*self.cache_misses/self.memory_accesses:.1f}%)
+Cache hits: {cache_hits} ({100*cache_hits/self.memory_accesses:.1f}%)
+Cache misses: {cache_misses} ({100*cache_misses/self.memory_accesses:.1f}%)
 RAM memory used: {ram_mem} bytes.
 Data register memory used: {cache_mem} bytes.
 -----------------------------
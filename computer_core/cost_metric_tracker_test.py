@@ -0,0 +1,80 @@
+"""This file contains unit tests of the cost metric tracker, running small programs under it."""
+
+import unittest
+
+from computer_core import computer
+from computer_core.constants import *
+from computer_core.cost_metric_tracker import CostMetricTracker
+from assembler.assembler import assemble
+
+# Each LOAD is fetched from and reads one address, with address 100 read three times so that it is a cache hit after
+# the first read.
+program = assemble("""
+LOAD 100 2
+LOAD 100 3
+LOAD 101 4
+LOAD 100 5
+HALT
+""")
+
+
+def run_tracked(sample_rate=1):
+    c = computer.Computer(memory_size=128)
+    c.set_memory_chunk(0, program)
+    with CostMetricTracker(c, sample_rate=sample_rate) as cost_tracker:
+        c.execute()
+    return cost_tracker
+
+
+class TestCostMetricTracker(unittest.TestCase):
+    def test_invalid_sample_rate(self):
+        for sample_rate in (0, -0.5, 1.5):
+            with self.subTest(sample_rate=sample_rate), self.assertRaises(ValueError):
+                CostMetricTracker(computer.Computer(memory_size=8), sample_rate=sample_rate)
+
+    def test_sample_period(self):
+        """Test that the sample period is the inverse of the sample rate, rounded to a power of two."""
+        for sample_rate, sample_period in ((1, 1), (0.5, 2), (0.3, 4), (0.1, 8), (0.01, 128)):
+            with self.subTest(sample_rate=sample_rate):
+                tracker = CostMetricTracker(computer.Computer(memory_size=8), sample_rate=sample_rate)
+                self.assertEqual(sample_period, tracker.sample_period)
+
+    def test_sampling(self):
+        """
+        Test that sampling logs every memory access of the sampled instructions, their fetches included, and none of
+        the others, and that the cache figures are scaled up by the sample period.
+        """
+        tracker = run_tracked()
+        self.assertEqual(5, tracker.instructions_executed)
+        self.assertEqual((2, 7), (tracker.cache_hits, tracker.cache_misses))
+        self.assertEqual(
+            5 * INSTRUCTION_TIME_NS + 2 * CACHE_HIT_TIME_NS + 7 * CACHE_MISS_TIME_NS, tracker.execution_time_ns)
+
+        # Only the second and fourth instructions are sampled: their fetches from 1 and 3 miss, and their reads of
+        # 100 hit.
+        tracker = run_tracked(sample_rate=0.5)
+        self.assertEqual(5, tracker.instructions_executed)
+        self.assertEqual([(1, 1), (3, 1), (100, 2)],
+                         [(address, count) for address, count in enumerate(tracker.memory_access_counts) if count])
+        self.assertEqual((2, 2), (tracker.cache_hits, tracker.cache_misses))
+        self.assertEqual(8, tracker.memory_accesses)
+        self.assertEqual(
+            5 * INSTRUCTION_TIME_NS + (2 * CACHE_HIT_TIME_NS + 2 * CACHE_MISS_TIME_NS) * 2, tracker.execution_time_ns)
+
+        summary = tracker.summary().splitlines()
+        self.assertEqual(
+            "Cache figures estimated from 1 in 2 instructions; RAM memory used is a lower bound.", summary[0])
+        self.assertEqual("Instructions executed: 5.", summary[1])
+        self.assertEqual("Cache hits: 4 (50.0%)", summary[2])
+        self.assertEqual("Cache misses: 4 (50.0%)", summary[3])
+        self.assertEqual("Instructions executed: 5.", run_tracked().summary().splitlines()[0])
+
+    def test_hot_addresses(self):
+        """
+        Test that the most accessed addresses come first, that addresses accessed equally often are in order, and
+        that addresses which were never accessed are left out.
+        """
+        tracker = run_tracked()
+        self.assertEqual([(100, 3), (0, 1), (1, 1)], tracker.hot_addresses(3))
+        self.assertEqual([(100, 3), (0, 1), (1, 1), (2, 1), (3, 1), (4, 1), (101, 1)], tracker.hot_addresses(20))
+        self.assertEqual([], tracker.hot_addresses(0))
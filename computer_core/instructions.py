@@ -1,9 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import List
-from bitarray.util import int2ba
+from typing import List, Tuple, Optional
 from computer_core.constants import *
-from assembler.assembler_utils import make_ins_data, make_ins_reg, \
-    parse_arg, require_args, parse_arg_multiple
+from assembler.assembler_utils import data_encoder, reg_encoder, \
+    parse_arg, require_args, parse_arg_multiple, parse_flags
 
 
 class Instruction(ABC):
@@ -27,12 +26,19 @@ class Instruction(ABC):
 
     @staticmethod
     @abstractmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         """
-        Construct the machine code instruction data from the line of assembly code.
+        Construct the (opcode, arg1, arg2, data) fields of the machine code instruction from the line of assembly code.
         """
         pass
 
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        """
+        Return the line which is logged before the instruction is executed in debug mode, if any.
+        """
+        return None
+
     @staticmethod
     @abstractmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
@@ -49,6 +55,8 @@ class Instruction(ABC):
 class Nop(Instruction):
     """ Do nothing. """
 
+    encode = staticmethod(data_encoder(OPCODE_NOP))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_NOP
@@ -58,17 +66,23 @@ class Nop(Instruction):
         return 'NOP'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
-        return make_ins_data(OPCODE_NOP, 0, 0, 0)
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
+        return Nop.encode(0, 0, 0)
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        return "NOP"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
-        if computer.debug_mode: print("NOP")
+        pass
 
 
 class Halt(Instruction):
     """ Stop execution by resetting the 'running' flag. """
 
+    encode = staticmethod(data_encoder(OPCODE_HALT))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_HALT
@@ -78,14 +92,17 @@ class Halt(Instruction):
         return 'HALT'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
-        return make_ins_data(OPCODE_HALT, 0, 0, 0)
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
+        return Halt.encode(0, 0, 0)
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        return "HALT"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
         """ Stop execution by resetting the 'running' flag. """
-        if computer.debug_mode: print("HALT")
-        computer.status_reg[RUNNING_FLAG_INDEX] = False
+        computer.status_reg &= ~RUNNING_FLAG
 
 
 class Print(Instruction):
@@ -93,6 +110,8 @@ class Print(Instruction):
     Print the contents of data registers with indices register_1, register_2 and the memory at the given address.
     """
 
+    encode = staticmethod(data_encoder(OPCODE_PRINT))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_PRINT
@@ -102,16 +121,20 @@ class Print(Instruction):
         return 'PRINT'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg_1, reg_2, address = require_args(args, 3, 3)
-        return make_ins_data(OPCODE_PRINT, *parse_arg_multiple(32, reg_1, reg_2),
-                             parse_arg(address, MEMORY_SIZE_MAX))
+        return Print.encode(*parse_arg_multiple(32, reg_1, reg_2), parse_arg(address, MEMORY_SIZE_MAX))
 
     @staticmethod
-    def execute_on(computer, arg1: Int, arg2: Int, data: Int):
-        print(f"print: register {arg1}: {computer.data_regs[arg1]:032b} = {computer.data_regs[arg1]}, "
-              f"register {arg2}: {computer.data_regs[arg2]:032b} = {computer.data_regs[arg2]}, "
-              f"address {data}: {computer.memory[data]:032b} = {computer.memory[data]}")
+    def execute_on(computer, arg1: Int, arg2: Int, data: Int, *, file=None):
+        """ Print to file, which defaults to sys.stdout as for print(). """
+        # Each value is read once, so the address counts as a single memory access
+        value_1, value_2, memory_value = computer.data_regs[arg1], computer.data_regs[arg2], computer.memory[data]
+        message = (f"print: register {arg1}: {value_1:032b} = {value_1}, "
+                   f"register {arg2}: {value_2:032b} = {value_2}, "
+                   f"address {data}: {memory_value:032b} = {memory_value}")
+        computer.flush_debug_log()  # Keep the output in order
+        print(message, file=file)
 
 
 COPY_FLAGS = {"HALF": 0b10000, "FULL": 0,
@@ -120,6 +143,12 @@ COPY_FLAGS = {"HALF": 0b10000, "FULL": 0,
               "OVERWRITE": 0b00010, "NO_OVERWRITE": 0,
               "IMMEDIATE": 0b00001, "NORMAL": 0}
 
+# The 16 bit copies selected by the FRM_SIG, TO_SIG and OVERWRITE flags, indexed by those three consecutive bits of ARG2
+# Each is given as (source shift, destination shift, bits of the destination which are kept), so that a copy is a
+# single expression rather than a tree of branches on the flags.
+HALF_COPY_MODES = [(16 if mode & 0b100 else 0, 16 if mode & 0b010 else 0,
+                    0 if mode & 0b001 else int(HALF_ONES if mode & 0b010 else SIG_HALF_ONES)) for mode in range(8)]
+
 
 class Load(Instruction):
     """
@@ -127,6 +156,8 @@ class Load(Instruction):
     For a complete description of the flags, see the README.
     """
 
+    encode = staticmethod(data_encoder(OPCODE_LOAD))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_LOAD
@@ -136,48 +167,32 @@ class Load(Instruction):
         return "LOAD"
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         address, register, *flag_args = require_args(args, 2, None)
-        flags = Int(0)
-        for flag_arg in flag_args:
-            if flag_arg not in COPY_FLAGS:
-                raise SyntaxError(f"Unknown flag {flag_arg}.")
-            flags ^= COPY_FLAGS[flag_arg]
-        return make_ins_data(OPCODE_LOAD, parse_arg(register, 32), flags, parse_arg(address, MEMORY_SIZE_MAX))
+        return Load.encode(parse_arg(register, 32), parse_flags(flag_args, COPY_FLAGS),
+                          parse_arg(address, MEMORY_SIZE_MAX))
 
     @staticmethod
-    def execute_on(computer, arg1: Int, arg2: Int, data: Int):
-        if computer.debug_mode: print(f"load {arg1}, {arg2:05b}, {data}")
-        control_flags = int2ba(int(arg2), endian='little', length=5)
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        return f"load {arg1}, {arg2:05b}, {data}"
 
-        if control_flags[IMMEDIATE_FLAG_INDEX]:  # Immediate mode, instruction itcomputer is source
-            source_bits = computer.memory[computer.PC]
-        else:  # Load from memory
-            if not 0 <= data < computer.memory_size:
-                raise SegmentationFaultError(f"Attempted to read from address {data}, which is out of range.")
-            source_bits = computer.memory[data]
+    @staticmethod
+    def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        if arg2 & IMMEDIATE_FLAG:  # Immediate mode, instruction itcomputer is source
+            source_bits = computer.memory.read(computer.PC)
+        else:  # Load from memory. Memory.read raises the SegmentationFaultError for an out of range address.
+            source_bits = computer.memory.read(data)
 
-        if not control_flags[HALF_COPY_FLAG_INDEX]:  # moving all 32 bits
+        if not arg2 & HALF_COPY_FLAG:  # moving all 32 bits: the common case, so checked before the half copy logic
             computer.data_regs[arg1] = source_bits
             return
 
         # moving only 16 bits
-        if control_flags[SIGNIFICANT_SRC_FLAG_INDEX]:
-            half_source_bits = (SIG_HALF_ONES & source_bits) >> 16
-        else:
-            half_source_bits = HALF_ONES & source_bits
-
-        if control_flags[SIGNIFICANT_DST_FLAG_INDEX]:
-            if control_flags[OVERWRITE_FLAG_INDEX]:
-                computer.data_regs[arg1] = Int(half_source_bits << 16)  # Overwrite all the bits
-            else:
-                # Overwrite only the 16 affected bits
-                computer.data_regs[arg1] = Int((half_source_bits << 16) | (computer.data_regs[arg1] & HALF_ONES))
-        else:
-            if control_flags[OVERWRITE_FLAG_INDEX]:
-                computer.data_regs[arg1] = Int(half_source_bits)
-            else:
-                computer.data_regs[arg1] = Int(half_source_bits | (computer.data_regs[arg1] & SIG_HALF_ONES))
+        source_shift, destination_shift, kept_bits = HALF_COPY_MODES[(arg2 >> OVERWRITE_FLAG_INDEX) & 0b111]
+        half_copy = ((source_bits >> source_shift) & 0xFFFF) << destination_shift
+        if kept_bits:  # Overwrite only the 16 affected bits
+            half_copy |= computer.data_regs[arg1] & kept_bits
+        computer.data_regs[arg1] = half_copy
 
 
 class Store(Instruction):
@@ -186,6 +201,8 @@ class Store(Instruction):
     For a complete description of the flags, see the README.
     """
 
+    encode = staticmethod(data_encoder(OPCODE_STORE))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_STORE
@@ -195,48 +212,36 @@ class Store(Instruction):
         return "STORE"
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         register, address, *flag_args = require_args(args, 2, None)
-        flags = Int(0)
-        for flag_arg in flag_args:
-            if flag_arg not in COPY_FLAGS:
-                raise SyntaxError(f"Unknown flag {flag_arg}.")
-            flags ^= COPY_FLAGS[flag_arg]
-        return make_ins_data(OPCODE_STORE, parse_arg(register, 32), flags, parse_arg(address, MEMORY_SIZE_MAX))
+        return Store.encode(parse_arg(register, 32), parse_flags(flag_args, COPY_FLAGS),
+                           parse_arg(address, MEMORY_SIZE_MAX))
 
     @staticmethod
-    def execute_on(computer, arg1: Int, arg2: Int, data: Int):
-        if computer.debug_mode: print(f"store {arg1}, {arg2:05b}, {data}")
-        control_flags = int2ba(int(arg2), endian='little', length=5)
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        return f"store {arg1}, {arg2:05b}, {data}"
 
+    @staticmethod
+    def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        memory = computer.memory
         if not 0 <= data < computer.memory_size:
             raise SegmentationFaultError(f"Attempted to write to address {data}, which is out of range.")
 
-        if control_flags[IMMEDIATE_FLAG_INDEX]:  # Immediate mode, instruction itcomputer is source
-            source_bits = computer.memory[computer.PC]
+        if arg2 & IMMEDIATE_FLAG:  # Immediate mode, instruction itcomputer is source
+            source_bits = memory.read(computer.PC)
         else:  # Load from memory
             source_bits = computer.data_regs[arg1]
 
-        if not control_flags[HALF_COPY_FLAG_INDEX]:  # moving all 32 bits
-            computer.memory[data] = source_bits
+        if not arg2 & HALF_COPY_FLAG:  # moving all 32 bits: the common case, so checked before the half copy logic
+            memory.write(data, source_bits)
             return
 
         # moving only 16 bits
-        if control_flags[SIGNIFICANT_SRC_FLAG_INDEX]:
-            half_source_bits = (SIG_HALF_ONES & source_bits) >> 16
-        else:
-            half_source_bits = HALF_ONES & source_bits
-
-        if control_flags[SIGNIFICANT_DST_FLAG_INDEX]:
-            if control_flags[OVERWRITE_FLAG_INDEX]:  # Overwrite all the bits
-                computer.memory[data] = Int(half_source_bits << 16)
-            else:  # Overwrite only the 16 affected bits
-                computer.memory[data] = Int((half_source_bits << 16) | (computer.memory[data] & HALF_ONES))
-        else:
-            if control_flags[OVERWRITE_FLAG_INDEX]:
-                computer.memory[data] = Int(half_source_bits)
-            else:
-                computer.memory[data] = Int(half_source_bits | (computer.memory[data] & SIG_HALF_ONES))
+        source_shift, destination_shift, kept_bits = HALF_COPY_MODES[(arg2 >> OVERWRITE_FLAG_INDEX) & 0b111]
+        half_copy = ((source_bits >> source_shift) & 0xFFFF) << destination_shift
+        if kept_bits:  # Overwrite only the 16 affected bits
+            half_copy |= memory.read(data) & kept_bits
+        memory.write(data, half_copy)
 
 
 JUMP_FLAGS = {"ON_HIGH": 0b10000, "ON_LOW": 0, "DEC": 0b01000, "INC": 0}
@@ -247,6 +252,8 @@ class Jump(Instruction):
     A conditional relative jump, performed by modifying the program counter.
     """
 
+    encode = staticmethod(data_encoder(OPCODE_JMP))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_JMP
@@ -256,27 +263,24 @@ class Jump(Instruction):
         return "JUMP"
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         comp_reg, amount, *flag_args = require_args(args, 3, None)
-        flags = Int(0)
-        for flag_arg in flag_args:
-            if flag_arg not in JUMP_FLAGS:
-                raise SyntaxError(f"Unknown flag {flag_arg}.")
-            flags ^= JUMP_FLAGS[flag_arg]
         if amount[0] == '[' and amount[-1] == ']':
-            # find label distance. up to programmer to specify direction. no error checking for simplicity.
-            parsed_amount = Int(abs(labels[amount[1:-1]] - line_index))
+            # find label distance. up to programmer to specify direction. labels are checked by the assembler.
+            parsed_amount = abs(labels[amount[1:-1]] - line_index)
         else:
             parsed_amount = parse_arg(amount, MEMORY_SIZE_MAX)
-        return make_ins_data(OPCODE_JMP, parse_arg(comp_reg, 32), flags, parsed_amount)
+        return Jump.encode(parse_arg(comp_reg, 32), parse_flags(flag_args, JUMP_FLAGS), parsed_amount)
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        return f"jump control register={arg1}, flags={arg2:05b}, amount={data=}"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
-        if computer.debug_mode: print(f"jump control register={arg1}, flags={arg2:05b}, amount={data=}")
-        control_flags = int2ba(int(arg2), endian='little', length=5)
-        if computer.comp_reg[arg1] == control_flags[JUMP_CONDITION_INDEX]:
+        if (computer.comp_reg >> arg1) & 1 == (arg2 >> JUMP_CONDITION_INDEX) & 1:
             # subtract 1 for convenience as the computer will add one at the end of the cycle
-            new_PC = computer.PC - data - 1 if control_flags[JUMP_SUBTRACT_INDEX] else computer.PC + data - 1
+            new_PC = computer.PC - data - 1 if arg2 & JUMP_SUBTRACT_FLAG else computer.PC + data - 1
             if not 0 <= new_PC < computer.memory_size:
                 raise SegmentationFaultError(f"Attempted to move program counter to {new_PC}, which is out of bounds.")
             computer.PC = new_PC
@@ -288,6 +292,8 @@ class Add(Instruction):
     In case of overflow, set the relevant status bit.
     """
 
+    encode = staticmethod(reg_encoder(OPCODE_ADD))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_ADD
@@ -297,19 +303,23 @@ class Add(Instruction):
         return "ADD"
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, reg3 = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_ADD, *parse_arg_multiple(32, reg1, reg2, reg3))
+        return Add.encode(*parse_arg_multiple(32, reg1, reg2, reg3))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        reg3 = data >> 11
+        return f"add reg_1={arg1}, reg_2={arg2}, reg_3={reg3}"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         reg3 = data >> 11
-        if computer.debug_mode: print(f"add reg_1={arg1}, reg_2={arg2}, reg_3={reg3}")
-        if int(computer.data_regs[arg1]) + int(computer.data_regs[arg2]) >= 1 << 32:  # Overflow occurred.
-            computer.status_reg[OVERFLOW_FLAG_INDEX] = True
-        else:
-            computer.status_reg[OVERFLOW_FLAG_INDEX] = False
-        computer.data_regs[reg3] = computer.data_regs[arg1] + computer.data_regs[arg2]
+        result = data_regs[arg1] + data_regs[arg2]
+        # Bit 32 of the result is set exactly when overflow occurred.
+        computer.status_reg = (computer.status_reg & ~OVERFLOW_FLAG) | ((result >> 32) << OVERFLOW_FLAG_INDEX)
+        data_regs[reg3] = result & WORD_MASK
 
 
 class Sub(Instruction):
@@ -318,6 +328,8 @@ class Sub(Instruction):
     In case of underflow, set the relevant status bit.
     """
 
+    encode = staticmethod(reg_encoder(OPCODE_SUB))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_SUB
@@ -327,19 +339,23 @@ class Sub(Instruction):
         return "SUB"
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, reg3 = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_SUB, *parse_arg_multiple(32, reg1, reg2, reg3))
+        return Sub.encode(*parse_arg_multiple(32, reg1, reg2, reg3))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        reg_3 = data >> 11
+        return f"sub {arg1=}, {arg2=}, {reg_3=}"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         reg_3 = data >> 11
-        if computer.debug_mode: print(f"sub {arg1=}, {arg2=}, {reg_3=}")
-        if int(computer.data_regs[arg1]) - int(computer.data_regs[arg2]) < 0:  # Underflow occurred.
-            computer.status_reg[OVERFLOW_FLAG_INDEX] = True
-        else:
-            computer.status_reg[OVERFLOW_FLAG_INDEX] = False
-        computer.data_regs[reg_3] = computer.data_regs[arg1] - computer.data_regs[arg2]
+        result = data_regs[arg1] - data_regs[arg2]
+        # A negative result means underflow occurred.
+        computer.status_reg = (computer.status_reg & ~OVERFLOW_FLAG) | ((result < 0) << OVERFLOW_FLAG_INDEX)
+        data_regs[reg_3] = result & WORD_MASK
 
 
 class Comp(Instruction):
@@ -347,6 +363,8 @@ class Comp(Instruction):
     Compare the contents of reg_2 and the contents of reg_1 and set the specified bit in the COMP_REG.
     """
 
+    encode = staticmethod(reg_encoder(OPCODE_COMP))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_COMP
@@ -356,17 +374,21 @@ class Comp(Instruction):
         return 'COMP'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, comp_reg = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_COMP, *parse_arg_multiple(32, reg1, reg2, comp_reg))
+        return Comp.encode(*parse_arg_multiple(32, reg1, reg2, comp_reg))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        comp_reg = data >> 11
+        return "\n".join((f"comp reg_1={arg1}, reg_2={arg2}, comp_reg={comp_reg}",
+                          f"compare {arg1=}, {arg2=}, {comp_reg=}"))
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         comp_reg = data >> 11
-        if computer.debug_mode:
-            print(f"comp reg_1={arg1}, reg_2={arg2}, comp_reg={comp_reg}")
-        if computer.debug_mode: print(f"compare {arg1=}, {arg2=}, {comp_reg=}")
-        computer.comp_reg[comp_reg] = computer.data_regs[arg1] == computer.data_regs[arg2]
+        computer.comp_reg = (computer.comp_reg & ~(1 << comp_reg)) | ((data_regs[arg1] == data_regs[arg2]) << comp_reg)
 
 
 #
@@ -379,6 +401,8 @@ class LShift(Instruction):
     and store the result in the register given by DATA. Set overflow bit if necessary.
     """
 
+    encode = staticmethod(reg_encoder(OPCODE_LSHIFT))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_LSHIFT
@@ -388,31 +412,37 @@ class LShift(Instruction):
         return 'LSHIFT'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, reg3 = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_LSHIFT, *parse_arg_multiple(32, reg1, reg2, reg3))
+        return LShift.encode(*parse_arg_multiple(32, reg1, reg2, reg3))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        reg_3 = data >> 11
+        return f"LShift reg_1={arg1}, reg_2={arg2}, {reg_3=}"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         reg_3 = data >> 11
-        if computer.debug_mode: print(f"LShift reg_1={arg1}, reg_2={arg2}, {reg_3=}")
-        if computer.data_regs[arg2] >= 32: # No need to calculate such large numbers.
-            if computer.data_regs[arg1] > 0:
-                computer.status_reg[OVERFLOW_FLAG_INDEX] = True
-            computer.data_regs[reg_3] = ZERO
+        if data_regs[arg2] >= 32: # No need to calculate such large numbers.
+            if data_regs[arg1] > 0:
+                computer.status_reg |= OVERFLOW_FLAG
+            data_regs[reg_3] = ZERO
             return
 
-        if int(computer.data_regs[arg1]) << int(computer.data_regs[arg2]) >= 1 << 32:  # Overflow occurred.
-            computer.status_reg[OVERFLOW_FLAG_INDEX] = True
-        else:
-            computer.status_reg[OVERFLOW_FLAG_INDEX] = False
-        computer.data_regs[reg_3] = computer.data_regs[arg1] << computer.data_regs[arg2]
+        result = data_regs[arg1] << data_regs[arg2]
+        # Any bits above bit 31 of the result mean overflow occurred.
+        computer.status_reg = (computer.status_reg & ~OVERFLOW_FLAG) | ((result > WORD_MASK) << OVERFLOW_FLAG_INDEX)
+        data_regs[reg_3] = result & WORD_MASK
 
 
 class RShift(Instruction):
     """ Shift the contents of the register ARG1 right by an amount given by the contents of register ARG2,
     and store the result in the register given by DATA. """
 
+    encode = staticmethod(reg_encoder(OPCODE_RSHIFT))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_RSHIFT
@@ -422,18 +452,23 @@ class RShift(Instruction):
         return 'RSHIFT'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, reg3 = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_RSHIFT, *parse_arg_multiple(32, reg1, reg2, reg3))
+        return RShift.encode(*parse_arg_multiple(32, reg1, reg2, reg3))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        reg_3 = data >> 11
+        return f"RShift reg_1={arg1}, reg_2={arg2}, {reg_3=}"
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         reg_3 = data >> 11
-        if computer.debug_mode: print(f"RShift reg_1={arg1}, reg_2={arg2}, {reg_3=}")
-        if computer.data_regs[arg2] >= 32: # Will definitely give 0.
-            computer.data_regs[reg_3] = ZERO
+        if data_regs[arg2] >= 32: # Will definitely give 0.
+            data_regs[reg_3] = ZERO
             return
-        computer.data_regs[reg_3] = computer.data_regs[arg1] >> computer.data_regs[arg2]
+        data_regs[reg_3] = data_regs[arg1] >> data_regs[arg2]
 
 
 
@@ -443,6 +478,8 @@ class Comp_Greater_Than(Instruction):
     set the specified bit in the COMP_REG.
     """
 
+    encode = staticmethod(reg_encoder(OPCODE_COMPGRT))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_COMPGRT
@@ -452,17 +489,21 @@ class Comp_Greater_Than(Instruction):
         return 'COMPGRT'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, comp_reg = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_COMPGRT, *parse_arg_multiple(32, reg1, reg2, comp_reg))
+        return Comp_Greater_Than.encode(*parse_arg_multiple(32, reg1, reg2, comp_reg))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        comp_reg = data >> 11
+        return "\n".join((f"comp_grt reg_1={arg1}, reg_2={arg2}, comp_reg={comp_reg}",
+                          f"compare {arg1=}, {arg2=}, {comp_reg=}"))
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         comp_reg = data >> 11
-        if computer.debug_mode:
-            print(f"comp_grt reg_1={arg1}, reg_2={arg2}, comp_reg={comp_reg}")
-        if computer.debug_mode: print(f"compare {arg1=}, {arg2=}, {comp_reg=}")
-        computer.comp_reg[comp_reg] = computer.data_regs[arg1] > computer.data_regs[arg2]
+        computer.comp_reg = (computer.comp_reg & ~(1 << comp_reg)) | ((data_regs[arg1] > data_regs[arg2]) << comp_reg)
 
 class Comp_Less_Than(Instruction):
     """
@@ -470,6 +511,8 @@ class Comp_Less_Than(Instruction):
     set the specified bit in the COMP_REG.
     """
 
+    encode = staticmethod(reg_encoder(OPCODE_COMPLST))
+
     @staticmethod
     def opcode() -> Int:
         return OPCODE_COMPLST
@@ -479,16 +522,20 @@ class Comp_Less_Than(Instruction):
         return 'COMPLST'
 
     @staticmethod
-    def make_instruction(args: List[str], line_index, labels) -> Int:
+    def make_instruction(args: List[str], line_index, labels) -> Tuple:
         reg1, reg2, comp_reg = require_args(args, 3, 3)
-        return make_ins_reg(OPCODE_COMPLST, *parse_arg_multiple(32, reg1, reg2, comp_reg))
+        return Comp_Less_Than.encode(*parse_arg_multiple(32, reg1, reg2, comp_reg))
+
+    @staticmethod
+    def debug_message(arg1: Int, arg2: Int, data: Int) -> Optional[str]:
+        comp_reg = data >> 11
+        return "\n".join((f"comp_lst reg_1={arg1}, reg_2={arg2}, comp_reg={comp_reg}",
+                          f"compare {arg1=}, {arg2=}, {comp_reg=}"))
 
     @staticmethod
     def execute_on(computer, arg1: Int, arg2: Int, data: Int):
+        data_regs = computer.data_regs
         comp_reg = data >> 11
-        if computer.debug_mode:
-            print(f"comp_lst reg_1={arg1}, reg_2={arg2}, comp_reg={comp_reg}")
-        if computer.debug_mode: print(f"compare {arg1=}, {arg2=}, {comp_reg=}")
-        computer.comp_reg[comp_reg] = computer.data_regs[arg1] < computer.data_regs[arg2]
+        computer.comp_reg = (computer.comp_reg & ~(1 << comp_reg)) | ((data_regs[arg1] < data_regs[arg2]) << comp_reg)
 
 instructions = [Nop, Halt, Add, Sub, Load, Store, Comp, Jump, Print, LShift, RShift, Comp_Greater_Than, Comp_Less_Than]
@@ -1,10 +1,18 @@
-import unittest, bitarray, sys, io
+import unittest, io
 import numpy as np
 from computer_core import instructions, computer, constants
 from computer_core.constants import Int
 
 
+def combine(x, y):
+    """ Make a word with the 16-bit numbers x and y as its most and least significant halves respectively. """
+    return Int((x << 16) | y)
+
+
 class TestInstructions(unittest.TestCase):
+    # Some 16-bit numbers with the top bit set, shared by the tests which move halves of words around
+    HALVES = np.linspace(1 << 15, (1 << 16) - 1, 6).astype(Int)
+
     def test_print(self):
         """
         Test that the print function correctly prints two registers and an address in memory
@@ -17,12 +25,10 @@ class TestInstructions(unittest.TestCase):
                    " register 3: 10101010101010101010101010101010 = 2863311530," + \
                    " address 4: 11110000111100001111000011110000 = 4042322160\n"
 
-        redirect = io.StringIO()  # Create StringIO object
-        sys.stdout = redirect  # and redirect stdout.
-        instructions.Print.execute_on(c, 2, 3, 4)
-        sys.stdout = sys.__stdout__
+        output = io.StringIO()
+        instructions.Print.execute_on(c, 2, 3, 4, file=output)
 
-        self.assertEqual(redirect.getvalue(), expected)
+        self.assertEqual(output.getvalue(), expected)
 
     def test_print_error(self):
         """
@@ -38,11 +44,7 @@ class TestInstructions(unittest.TestCase):
         """
         Tests the various functionalities of the load instruction
         """
-
-        def combine(x, y):
-            return Int((x << 16) | y)
-
-        A, B, C, D, E, F = np.linspace(1 << 15, (1 << 16) - 1, 6).astype(Int)
+        A, B, C, D, E, F = self.HALVES
 
         starting_ins = combine(A, B)
         starting_reg = combine(C, D)
@@ -53,59 +55,22 @@ class TestInstructions(unittest.TestCase):
         c.memory[MEM := 1] = starting_mem
         c.data_regs[2:] = starting_reg
 
-        # full load from memory
-        REG = 3
-        expected = combine(E, F)
-        instructions.Load.execute_on(c, REG, 0b00000, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # low sig to low sig half load from memory
-        REG = 4
-        expected = combine(C, F)
-        instructions.Load.execute_on(c, REG, 0b10000, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # low sig to high sig half load from memory
-        REG = 5
-        expected = combine(F, D)
-        instructions.Load.execute_on(c, REG, 0b10100, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # high sig to low sig half load from memory
-        REG = 6
-        expected = combine(C, E)
-        instructions.Load.execute_on(c, REG, 0b11000, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # low sig to low sig half load from memory with overwrite
-        REG = 7
-        expected = combine(0, F)
-        instructions.Load.execute_on(c, REG, 0b10010, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # high sig to high sig half load from memory with overwrite
-        REG = 8
-        expected = combine(E, 0)
-        instructions.Load.execute_on(c, REG, 0b11110, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # full load from instruction (immediate)
-        REG = 9
-        expected = combine(A, B)
-        instructions.Load.execute_on(c, REG, 0b00001, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # low sig to low sig half load from instruction (immediate) with overwrite
-        REG = 9
-        expected = combine(0, B)
-        instructions.Load.execute_on(c, REG, 0b10011, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
-
-        # low sig to high sig half load from instruction (immediate) with overwrite
-        REG = 10
-        expected = combine(B, 0)
-        instructions.Load.execute_on(c, REG, 0b10111, MEM)
-        self.assertEqual(c.data_regs[REG], expected)
+        # Cases are run in order on the same computer, so each must use a fresh register unless it relies on the last
+        cases = [
+            ("full load from memory", 3, 0b00000, combine(E, F)),
+            ("low sig to low sig half load from memory", 4, 0b10000, combine(C, F)),
+            ("low sig to high sig half load from memory", 5, 0b10100, combine(F, D)),
+            ("high sig to low sig half load from memory", 6, 0b11000, combine(C, E)),
+            ("low sig to low sig half load from memory with overwrite", 7, 0b10010, combine(0, F)),
+            ("high sig to high sig half load from memory with overwrite", 8, 0b11110, combine(E, 0)),
+            ("full load from instruction (immediate)", 9, 0b00001, combine(A, B)),
+            ("low sig to low sig half load from instruction (immediate) with overwrite", 9, 0b10011, combine(0, B)),
+            ("low sig to high sig half load from instruction (immediate) with overwrite", 10, 0b10111, combine(B, 0)),
+        ]
+        for description, REG, mode, expected in cases:
+            with self.subTest(description):
+                instructions.Load.execute_on(c, REG, mode, MEM)
+                self.assertEqual(c.data_regs[REG], expected)
 
     def test_load_error(self):
         """
@@ -125,12 +90,7 @@ class TestInstructions(unittest.TestCase):
         """
         Tests the various functionalities of the store instruction
         """
-
-        def combine(x, y):
-            return Int((x << 16) | y)
-
-        # Generate some 16-bit numbers
-        A, B, C, D, E, F = np.linspace(1 << 15, (1 << 16) - 1, 6).astype(Int)
+        A, B, C, D, E, F = self.HALVES
         starting_ins = combine(A, B)
         starting_reg = combine(C, D)
         starting_mem = combine(E, F)
@@ -140,59 +100,21 @@ class TestInstructions(unittest.TestCase):
         c.memory[1:] = starting_mem
         c.data_regs[REG := 2] = starting_reg
 
-        # full store from register
-        MEM = 1
-        expected = combine(C, D)
-        instructions.Store.execute_on(c, REG, 0b00000, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # low sig to low sig half store from register
-        MEM = 2
-        expected = combine(E, D)
-        instructions.Store.execute_on(c, REG, 0b10000, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # low sig to high sig half store from register
-        MEM = 3
-        expected = combine(D, F)
-        instructions.Store.execute_on(c, REG, 0b10100, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # high sig to low sig half store from register
-        MEM = 4
-        expected = combine(E, C)
-        instructions.Store.execute_on(c, REG, 0b11000, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # low sig to low sig half store from register with overwrite
-        MEM = 5
-        expected = combine(0, D)
-        instructions.Store.execute_on(c, REG, 0b10010, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # high sig to high sig half store from memory with overwrite
-        MEM = 6
-        expected = combine(C, 0)
-        instructions.Store.execute_on(c, REG, 0b11110, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # full store from instruction (immediate)
-        MEM = 7
-        expected = combine(A, B)
-        instructions.Store.execute_on(c, REG, 0b00001, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # low sig to low sig half store from instruction (immediate) with overwrite
-        MEM = 8
-        expected = combine(0, B)
-        instructions.Store.execute_on(c, REG, 0b10011, MEM)
-        self.assertEqual(c.memory[MEM], expected)
-
-        # low sig to high sig half store from instruction (immediate) with overwrite
-        MEM = 9
-        expected = combine(B, 0)
-        instructions.Store.execute_on(c, REG, 0b10111, MEM)
-        self.assertEqual(c.memory[MEM], expected)
+        cases = [
+            ("full store from register", 1, 0b00000, combine(C, D)),
+            ("low sig to low sig half store from register", 2, 0b10000, combine(E, D)),
+            ("low sig to high sig half store from register", 3, 0b10100, combine(D, F)),
+            ("high sig to low sig half store from register", 4, 0b11000, combine(E, C)),
+            ("low sig to low sig half store from register with overwrite", 5, 0b10010, combine(0, D)),
+            ("high sig to high sig half store from memory with overwrite", 6, 0b11110, combine(C, 0)),
+            ("full store from instruction (immediate)", 7, 0b00001, combine(A, B)),
+            ("low sig to low sig half store from instruction (immediate) with overwrite", 8, 0b10011, combine(0, B)),
+            ("low sig to high sig half store from instruction (immediate) with overwrite", 9, 0b10111, combine(B, 0)),
+        ]
+        for description, MEM, mode, expected in cases:
+            with self.subTest(description):
+                instructions.Store.execute_on(c, REG, mode, MEM)
+                self.assertEqual(c.memory[MEM], expected)
 
     def test_store_error(self):
         """
@@ -210,10 +132,10 @@ class TestInstructions(unittest.TestCase):
         Test that halt resets the 'running' flag
         """
         c = computer.Computer()
-        c.status_reg[constants.RUNNING_FLAG_INDEX] = True
+        c.status_reg |= constants.RUNNING_FLAG
         instructions.Halt.execute_on(c, Int(0), Int(0), Int(0))
 
-        self.assertEqual(False, c.status_reg[constants.RUNNING_FLAG_INDEX])
+        self.assertEqual(0, c.status_reg & constants.RUNNING_FLAG)
 
     def test_add(self):
         """
@@ -230,18 +152,18 @@ class TestInstructions(unittest.TestCase):
 
         instructions.Add.execute_on(c, REG1, REG2, REG3 << 11)
         self.assertEqual(expected, c.data_regs[REG3])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Also test that it can add in-place
         instructions.Add.execute_on(c, REG1, REG2, REG2 << 11)
         self.assertEqual(expected, c.data_regs[REG2])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Test overflow behaviour
         c.data_regs[REG1] = Int((1 << 32) - 1)
         c.data_regs[REG2] = Int(1)
         instructions.Add.execute_on(c, REG1, REG2, REG3 << 11)
-        self.assertEqual(1, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(1, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
     def test_sub(self):
         """
@@ -258,16 +180,16 @@ class TestInstructions(unittest.TestCase):
 
         instructions.Sub.execute_on(c, REG1, REG2, REG3 << 11)
         self.assertEqual(expected, c.data_regs[REG3])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Also test that it subtract in-place
         instructions.Sub.execute_on(c, REG1, REG2, REG2 << 11)
         self.assertEqual(expected, c.data_regs[REG2])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Test underflow behaviour
         instructions.Sub.execute_on(c, REG2, REG1, REG3 << 11)
-        self.assertEqual(1, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(1, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
     def test_jump(self):
         """
@@ -291,7 +213,7 @@ class TestInstructions(unittest.TestCase):
         self.assertEqual(5, c.PC)
 
         # ...but do when it is set
-        c.comp_reg[5] = True
+        c.comp_reg |= 1 << 5
         c.PC = 5
         instructions.Jump.execute_on(c, 5, 0b10000, 3)
         self.assertEqual(7, c.PC)
@@ -328,11 +250,11 @@ class TestInstructions(unittest.TestCase):
         c.data_regs[REG1] = a
         c.data_regs[REG2] = a
         c.data_regs[REG3] = b
-        expected = bitarray.bitarray('0' * 32, endian='little')
+        expected = 0
 
         # These two are the same
         instructions.Comp.execute_on(c, REG1, REG2, 3 << 11)
-        expected[3] = True
+        expected |= 1 << 3
         self.assertEqual(expected, c.comp_reg)
 
         # These are different
@@ -341,7 +263,7 @@ class TestInstructions(unittest.TestCase):
 
         # Comparing register to itself should also work
         instructions.Comp.execute_on(c, REG3, REG3, 1 << 11)
-        expected[1] = True
+        expected |= 1 << 1
         self.assertEqual(expected, c.comp_reg)
 
     #
@@ -365,16 +287,16 @@ class TestInstructions(unittest.TestCase):
 
         instructions.LShift.execute_on(c, REG1, REG2, REG3 << 11)
         self.assertEqual(expected, c.data_regs[REG3])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Also test that it shifts in-place
         instructions.LShift.execute_on(c, REG1, REG2, REG2 << 11)
         self.assertEqual(expected, c.data_regs[REG2])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Test overflow behaviour
         instructions.LShift.execute_on(c, REG1, REG4, REG4 << 11)
-        self.assertEqual(1, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(1, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
     def test_rshift(self):
         """
@@ -391,17 +313,17 @@ class TestInstructions(unittest.TestCase):
 
         instructions.RShift.execute_on(c, REG1, REG2, REG3 << 11)
         self.assertEqual(expected, c.data_regs[REG3])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Also test that it shifts in-place
         instructions.RShift.execute_on(c, REG1, REG2, REG1 << 11)
         self.assertEqual(expected, c.data_regs[REG1])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
         # Test that it goes to zero
         instructions.RShift.execute_on(c, REG1, REG2, REG1 << 11)
         self.assertEqual(0, c.data_regs[REG1])
-        self.assertEqual(0, c.status_reg[constants.OVERFLOW_FLAG_INDEX])
+        self.assertEqual(0, (c.status_reg >> constants.OVERFLOW_FLAG_INDEX) & 1)
 
     def test_comp_grt(self):
         """
@@ -413,16 +335,16 @@ class TestInstructions(unittest.TestCase):
         REG1, REG2, REG3 = 2, 3, 4
         c.data_regs[REG1] = a
         c.data_regs[REG2] = b
-        expected = bitarray.bitarray('0' * 32, endian='little')
+        expected = 0
 
         # 20 > 10, should set bit 3
         instructions.Comp_Greater_Than.execute_on(c, REG2, REG1, 3 << 11)
-        expected[3] = True
+        expected |= 1 << 3
         self.assertEqual(expected, c.comp_reg)
 
         # 10 < 20, should unset bit 3
         instructions.Comp_Greater_Than.execute_on(c, REG1, REG2, 3 << 11)
-        expected[3] = False
+        expected &= ~(1 << 3)
         self.assertEqual(expected, c.comp_reg)
 
         # Comparing register to itself should also work
@@ -439,16 +361,16 @@ class TestInstructions(unittest.TestCase):
         REG1, REG2, REG3 = 2, 3, 4
         c.data_regs[REG1] = a
         c.data_regs[REG2] = b
-        expected = bitarray.bitarray('0' * 32, endian='little')
+        expected = 0
 
         # 10 < 20, should set bit 3
         instructions.Comp_Less_Than.execute_on(c, REG2, REG1, 3 << 11)
-        expected[3] = True
+        expected |= 1 << 3
         self.assertEqual(expected, c.comp_reg)
 
         # 20 > 10, should unset bit 3
         instructions.Comp_Less_Than.execute_on(c, REG1, REG2, 3 << 11)
-        expected[3] = False
+        expected &= ~(1 << 3)
         self.assertEqual(expected, c.comp_reg)
 
         # Comparing register to itself should also work
@@ -1,10 +1,46 @@
+from array import array
 from math import ceil
 
 import numpy as np
-from bitarray import bitarray
 
 from computer_core.constants import *
 
+
+def _cache_hit_tree_update(cache_pos):
+    """
+    Walk up the tree of a cache section from a hit at cache_pos, flipping each bit on the way to point away from it.
+    Returns the update as (mask of bits kept, bits set), which only depends on cache_pos. See Memory for the layout.
+    """
+    kept_bits, set_bits = (1 << (CACHE_SECTION_SIZE - 1)) - 1, 0
+    path = cache_pos + CACHE_SECTION_SIZE - 1
+    while path != 0:
+        # Move to the parent, noting whether this was its left (m = 0) or right (m = 1) child
+        m = (path - 1) & 1
+        path = (path - 1) >> 1
+        # Flip bit to point away from direction of travel
+        kept_bits &= ~(1 << path)
+        set_bits |= (1 - m) << path
+    return kept_bits, set_bits
+
+
+def _cache_miss_tree_walk(tree_bits):
+    """
+    Walk down the tree of a cache section on a miss, flipping bits along the way. Returns the new tree bits and the
+    cache_index reached, which only depend on the old tree bits.
+    """
+    path = 0
+    while path < CACHE_SECTION_SIZE - 1:
+        tree_bits ^= 1 << path
+        path = path*2 + 2 - ((tree_bits >> path) & 1)
+    return tree_bits, path - (CACHE_SECTION_SIZE - 1)
+
+
+# The tree walks are evaluated once for every cache_index and every state of a section's tree bits, so that
+# cache_lookup only has to look up the result
+_CACHE_HIT_TREE_UPDATES = [_cache_hit_tree_update(cache_pos) for cache_pos in range(CACHE_SECTION_SIZE)]
+_CACHE_MISS_TREE_WALKS = [_cache_miss_tree_walk(tree_bits) for tree_bits in range(1 << (CACHE_SECTION_SIZE - 1))]
+
+
 class Memory:
     """
     Memory class: basically a wrapper around a numpy array which allows for some custom behaviour.
@@ -18,62 +54,138 @@ class Memory:
         self.cache_section_size = CACHE_SECTION_SIZE
         self.cache_section_number = ceil(memory_size / CACHE_SECTION_RESPONSIBILITY)
 
-        self._array = np.zeros(memory_size, dtype=Int)
-        self._cache = np.zeros((self.cache_section_number,CACHE_SECTION_SIZE), dtype = Int) # value indicates no reference
-        self._cache_addresses = np.ones((self.cache_section_number, CACHE_SECTION_SIZE), dtype = Int) * ONES
-        self._cache_tree_bits = [bitarray('0' * (CACHE_SECTION_SIZE - 1), endian ='little')
-                                 for _ in range(self.cache_section_number)]
+        # Main memory and the cache values are stored in array.arrays, which read and write single words as plain ints
+        # without boxing numpy scalars. _array and _cache are numpy views of the same buffers for the bulk operations.
+        # Building from zeroed bytes writes every element, so pages are faulted in here rather than during a program.
+        self._words = array('I', bytes(4 * memory_size))
+        self._array = np.frombuffer(self._words, dtype=Int)
+        # The cache values are indexed by slot = cache_section * CACHE_SECTION_SIZE + cache_index
+        self._cache_slots = array('I', bytes(4 * self.cache_section_number * CACHE_SECTION_SIZE))
+        self._cache = np.frombuffer(self._cache_slots, dtype=Int).reshape(self.cache_section_number, CACHE_SECTION_SIZE)
+        self._cache_addresses = np.full((self.cache_section_number, CACHE_SECTION_SIZE), ONES, dtype=Int)
+        # Flat view of the above. Indexing with a single int is much quicker than with a (section, index) tuple, so
+        # single accesses go through this.
+        self._cache_slot_addresses = self._cache_addresses.reshape(-1)
+        # The CACHE_SECTION_SIZE - 1 tree bits of each section are packed into a single int. These are held in a list
+        # rather than an array, as they are read and written on every access, and only ever as whole ints
+        self._cache_tree_bits = [0] * self.cache_section_number
+        # For each section, a dict from the addresses held to their position in the section. This mirrors
+        # _cache_addresses, but a hit can be found with a single hashed lookup rather than a numpy compare
+        self._cache_positions = [{} for _ in range(self.cache_section_number)]
+        # For each slot, whether it has been written since it was filled, so must be written back to memory on eviction
+        self._cache_dirty = bytearray(self.cache_section_number * CACHE_SECTION_SIZE)
+        # The CostMetricTracker in use, if any, which is told about every cache lookup
+        self.cost_tracker = None
 
     def __getitem__(self, address):
         if type(address) is slice:
-            # Slice logic: to work with caches: make these a series of single accesses
+            # Slice logic: read main memory in bulk, taking the values of any cached addresses from the cache, as these
+            # may be newer. Like copy_from, this is for access from outside the computer, so the cache is not updated.
             start, stop = address.start or 0, address.stop or self.size
-            return_array = np.zeros((stop - start), dtype = Int)
-            for i, adr in enumerate(range(start, stop)):
-                return_array[i] = self.__getitem__(adr)
+            if not 0 <= start <= stop <= self.size:
+                raise SegmentationFaultError(
+                    f"Attempted to read addresses {start} to {stop - 1}, which are out of bounds (max {self.size}).")
+            return_array = self._array[start:stop].copy()
+            cached = self._cached_in_range(start, stop)
+            return_array[self._cache_addresses[cached] - start] = self._cache[cached]
             return return_array
 
-        # Normal lookup
+        return self.read(address)
+
+    def read(self, address):
+        """
+        Read a single address through the cache. Used directly by the computer to skip the slice handling.
+        """
         if not 0 <= address < self.size:
             raise SegmentationFaultError(
                 f"Attempted to read address {address}, which is out of bounds (max {self.size}).")
 
-        cache_section, cache_index, cache_hit = self.cache_lookup(address)
+        # Values are returned as Python ints, rather than boxed into fresh numpy scalars, as the instructions are faster
+        # working on ints anyway
+        cache_slot, cache_hit = self.cache_lookup(address)
         if cache_hit:
-            return self._cache[cache_section, cache_index]
+            return self._cache_slots[cache_slot]
 
         # Otherwise need to store in the cache
-        self._cache[cache_section, cache_index] = self._array[address]
-        return self._cache[cache_section, cache_index]
+        value = self._words[address]
+        self._cache_slots[cache_slot] = value
+        return value
 
     def __setitem__(self, address, value):
         if type(address) is slice:
-            # Slice logic: to work with caches: make these a series of single accesses
+            # Slice logic: write main memory in bulk through copy_from, which keeps the cache coherent
             start, stop = address.start or 0, address.stop or self.size # to convert slice into range
             if type(value) is Array:
                 if value.size != (stop - start):
                     raise ValueError("Value must be an array of same length as the slice.")
-                for adr, val in zip(range(start, stop), value):
-                    self.__setitem__(adr,val)
+                self.copy_from(start, value)
             else: # single value set
-                for adr in range(start,stop):
-                    self.__setitem__(adr, value)
+                if type(value) is not Int:
+                    raise TypeError("Type of value when setting memory should be uint32.")
+                self.copy_from(start, np.full(max(stop - start, 0), value, dtype=Int))
             return
 
+        if type(value) is not Int:
+            raise TypeError("Type of value when setting memory should be uint32.")
+        self.write(address, value)
 
+    def write(self, address, value):
+        """
+        Write a single address through the cache. Used directly by the computer to skip the slice handling.
+        Unlike setting an item, this also takes the plain ints held in the registers, so the instructions need not box
+        each value into a uint32 first. It is up to the caller to make sure the value fits in 32 bits.
+        """
         # Single access: error checking
         if not 0 <= address < self.size:
             raise SegmentationFaultError(
                 f"Attempted to set address {address}, which is out of bounds (max {self.size}).")
-        if type(value) is not Int:
+
+        cache_slot, cache_hit = self.cache_lookup(address)
+
+        self._cache_slots[cache_slot] = value
+        self._cache_dirty[cache_slot] = 1
+
+    def prefetch(self, address):
+        """
+        Bring an address into the cache ahead of its use. This is only a hint, so addresses out of bounds are ignored.
+        """
+        if 0 <= address < self.size:
+            self.read(address)
+
+    def copy_from(self, address, data):
+        """
+        Bulk write of a contiguous chunk directly into main memory, bypassing the cache as a program loader would.
+        Any of the addresses which are currently cached are updated too, so the cache stays coherent.
+        """
+        if not 0 <= address <= self.size - data.size:
+            raise SegmentationFaultError(
+                f"Attempted to set addresses {address} to {address + data.size - 1}, "
+                f"which are out of bounds (max {self.size}).")
+        if data.dtype != Int:
             raise TypeError("Type of value when setting memory should be uint32.")
 
-        cache_section, cache_index, cache_hit = self.cache_lookup(address)
+        np.copyto(self._array[address: address + data.size], data, casting='no')
+        cached = self._cached_in_range(address, address + data.size)
+        self._cache[cached] = self._array[self._cache_addresses[cached]]
+
+    def flush(self):
+        """
+        Write every dirty cache slot back to main memory in one go, so that main memory is up to date. The cache keeps
+        its contents, which are now all clean.
+        """
+        dirty = np.frombuffer(self._cache_dirty, dtype=bool)  # a view, so clearing this clears the dirty bits
+        self._array[self._cache_slot_addresses[dirty]] = self._cache.reshape(-1)[dirty]
+        dirty[:] = False
 
-        self._cache[cache_section, cache_index] = value
+    def _cached_in_range(self, start, stop):
+        """
+        Return a mask over the cache of the entries which hold addresses in the range [start, stop).
+        """
+        return (start <= self._cache_addresses) & (self._cache_addresses < stop)
 
     """
-    Note _cache_tree_bits follows a heap convention: that is, the bits in a single section are indexed as follows:
+    Note _cache_tree_bits follows a heap convention: that is, the bits packed into a single section's int are indexed
+    (from least significant) as follows:
 
           ┌------0------┐       ╮
        ┌--1---┐      ┌--2---┐   ├ _cache_tree_bits index
@@ -85,33 +197,37 @@ class Memory:
     """
 
     def cache_lookup(self, address):
-        cache_section = CACHE_SECTION_INDEX_MASK.get(address)
-        if address in self._cache_addresses[cache_section]:
-
-            #    Cache hit: move up the tree, flipping bits.
-            cache_pos = np.where(self._cache_addresses[cache_section] == address)[0][0]
-            path = cache_pos + self.cache_section_size - 1
-            while path != 0:
-                d, m = divmod(path - 1,2)
-                path = d
-                # Flip bit to point away from direction of travel
-                self._cache_tree_bits[cache_section][path] = 1 - m
-            return cache_section, cache_pos, True
+        # Equivalent to CACHE_SECTION_INDEX_MASK.get(address) for the in-bounds addresses we are passed, without the
+        # method call on every access
+        cache_section = address >> CACHE_SECTION_SHIFT
+        cache_positions = self._cache_positions[cache_section]
+        cache_pos = cache_positions.get(address)
+        if cache_pos is not None:
+            # Cache hit: move up the tree, flipping bits (see _cache_hit_tree_update)
+            kept_bits, set_bits = _CACHE_HIT_TREE_UPDATES[cache_pos]
+            self._cache_tree_bits[cache_section] = (self._cache_tree_bits[cache_section] & kept_bits) | set_bits
+            if self.cost_tracker is not None:
+                self.cost_tracker.log_cache_lookup(address, True)
+            return cache_section * self.cache_section_size + cache_pos, True
         else:
-            # Cache miss: move down the tree along the path, flipping bits along the way
-            path = 0
-            while path < self.cache_section_size - 1:
-                self._cache_tree_bits[cache_section][path] ^= 1
-                path = path*2 + 2 - self._cache_tree_bits[cache_section][path]
-            path -= self.cache_section_size - 1
+            # Cache miss: move down the tree along the path, flipping bits along the way (see _cache_miss_tree_walk)
+            self._cache_tree_bits[cache_section], path = _CACHE_MISS_TREE_WALKS[self._cache_tree_bits[cache_section]]
+            cache_slot = cache_section * self.cache_section_size + path
 
-            # put whatever is there back into main memory, unless it is the sentinel value 0b111..11
-            if (replaced_address := self._cache_addresses[cache_section, path]) != ONES:
-                self._array[replaced_address] = self._cache[cache_section, path]
+            # put whatever is there back into main memory if it has been written to, unless it is the sentinel value
+            # 0b111..11 (which is never dirty)
+            if (replaced_address := self._cache_slot_addresses[cache_slot]) != ONES:
+                if self._cache_dirty[cache_slot]:
+                    self._words[replaced_address] = self._cache_slots[cache_slot]
+                    self._cache_dirty[cache_slot] = 0
+                del cache_positions[replaced_address]
 
             # update address
-            self._cache_addresses[cache_section, path] = address
-            return cache_section, path, False
+            self._cache_slot_addresses[cache_slot] = address
+            cache_positions[int(address)] = path
+            if self.cost_tracker is not None:
+                self.cost_tracker.log_cache_lookup(address, False)
+            return cache_slot, False
 
 class NoSuchRegisterError(Exception):
     pass
@@ -119,31 +235,55 @@ class NoSuchRegisterError(Exception):
 class DataRegisterArray:
     """
     Class which stores the data registers, and enforces the read-only 0 and 1 registers.
-    No error checking required for this one beyond default numpy errors.
+    The registers are held as plain ints, as arithmetic on these is much faster than on numpy scalars. It is up to the
+    instructions to truncate their results to 32 bits.
     """
-    def __init__(self, size = 32):
-        self._array = np.zeros(size, dtype = Int)
+    def __init__(self, size = 32, flush_debug_log=None):
+        self._array = [0] * size
         self.size = size
         self._array[1] = 1
+        # The CostMetricTracker in use, if any, which is told about every register access
+        self.cost_tracker = None
+        # Called before printing a warning, so that it comes after any debug output of the computer still held back
+        self.flush_debug_log = flush_debug_log
 
     def __setitem__(self, register, value):
-        if type(register) is slice:
-            # Slice logic: to work with caches: make these a series of single accesses
-            start, stop = register.start or 0, register.stop or self.size  # to convert slice into range
-            if type(value) is Array:
-                if value.size != (stop - start):
-                    raise ValueError("Value must be an array of same length as the slice.")
-                for reg, val in zip(range(start, stop), value):
-                    self.__setitem__(reg, val)
-            else:  # single value set
-                for reg in range(start, stop):
-                    self.__setitem__(reg, value)
+        # Single register writes come from every instruction which writes a register, so are checked for first
+        if type(register) is not slice:
+            if self.cost_tracker is not None:
+                self.cost_tracker.log_datacache_access(register)
+            if register > 1:
+                self._array[register] = int(value)
+            else:
+                self._warn_read_only(register)
             return
-        if register <= 1:
-            print(f"Warning: attempted to write to data register {register}, but it is read-only.")
-            return
-        self._array[register] = value
+
+        # Slice logic: write the writable registers in the range in one go, warning about any read-only ones
+        start, stop = register.start or 0, register.stop or self.size  # to convert slice into range
+        if not 0 <= start <= stop <= self.size:
+            raise NoSuchRegisterError(
+                f"Attempted to write registers {start} to {stop - 1}, which are out of bounds (max {self.size}).")
+        lowest_writable = max(start, 2)
+        if type(value) is Array:
+            if value.size != (stop - start):
+                raise ValueError("Value must be an array of same length as the slice.")
+            values = value[lowest_writable - start:].tolist()
+        else:  # single value set
+            values = [int(value)] * max(stop - lowest_writable, 0)
+        for reg in range(start, min(stop, 2)):
+            self._warn_read_only(reg)
+        if self.cost_tracker is not None:
+            for reg in range(start, stop):
+                self.cost_tracker.log_datacache_access(reg)
+        self._array[lowest_writable:stop] = values
+
+    def _warn_read_only(self, register):
+        if self.flush_debug_log is not None:
+            self.flush_debug_log()  # Keep the output in order
+        print(f"Warning: attempted to write to data register {register}, but it is read-only.")
 
     def __getitem__(self, register):
+        if self.cost_tracker is not None:
+            self.cost_tracker.log_datacache_access(register)
         return self._array[register]
 
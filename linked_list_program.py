@@ -24,6 +24,7 @@ The goal of the program is to find and return the value of the final element in
 """
 
 import unittest
+import numpy as np
 from computer_core.computer import Computer, Int
 from assembler.assembler import assemble
 from computer_core.cost_metric_tracker import CostMetricTracker
@@ -77,8 +78,7 @@ class TestLinkedList(unittest.TestCase):
         address = 50
         elements = [(2, 60), (3, 56), (5, 62), (7, 81), (11, (1 << 32) - 1)]
         for value, next_address in elements:
-            c.set_memory_address(address, Int(value))
-            c.set_memory_address(address + 1, Int(next_address))
+            c.set_memory_chunk(address, np.array([value, next_address], dtype=Int))
             address = next_address
 
         # Load the program
@@ -4,6 +4,8 @@ import unittest
 from computer_core.computer_test import TestComputer
 from computer_core.instructions_test import TestInstructions
 from computer_core.cache_test import TestCache
+from computer_core.cost_metric_tracker_test import TestCostMetricTracker
+from assembler.assembler_test import TestAssembler
 from fibonacci_program import TestFibonacci
 from linked_list_program import TestLinkedList
 from integer_division_program import TestIntegerDivision